@@ -13,156 +13,395 @@ Albert Cardona, 2017-06-23
 
 """
 
-from networkit import graph, algebraic
-from itertools import chain
+from networkit import graph, graphtools, algebraic
+import numpy as np
+from itertools import chain, repeat, tee, islice
 from collections import deque
+from operator import index
 from util import deprecated
 
+# Fraction of all edges above which edge removals left pending trigger compaction
+COMPACT_FRACTION = 0.25
+# Number of edges below which batches are added one edge at a time, skipping numpy
+BATCH_THRESHOLD = 1024
+
+try:
+    from itertools import pairwise
+except ImportError: # python < 3.10
+    def pairwise(iterable):
+        a, b = tee(iterable)
+        next(b, None)
+        return zip(a, b)
+
 class Graph:
     def __init__(self, weighted=True, directed=False, nkG=None):
         self.nkG = nkG if nkG is not None else graph.Graph(weighted=weighted, directed=directed)
+        # Cached to avoid calls into NetworKit: neither can change for a NetworKit graph
+        self._weighted = self.nkG.isWeighted()
+        self._directed = self.nkG.isDirected()
         # Map of user-defined nodes to NetworKit-defined node IDs
         self.unodes = {}
-        # Map of NetworKit-defined node IDs vs user-defined nodes
-        self.knodes = {}
+        # List of user-defined nodes indexed by NetworKit-defined node ID.
+        # NetworKit assigns node IDs as consecutive integers starting at zero,
+        # so that a list suffices. Removed nodes leave a None in their slot.
+        self.knodes = []
+        # Number of edges removed from NetworKit since its edges were last compacted
+        self._pending_removals = 0
 
     def to_user_nodes(self, knodes):
         """ Return the user-defined node corresponding to each given NetworKit node ID (a knode). """
-        for knode in knodes:
-            yield self.knodes[knode]
+        # Indexing into the list in C: no hashing, and no generator frame per knode
+        return map(self.knodes.__getitem__, knodes)
 
     def to_networkit_nodes(self, nodes):
         """ Return the NetworKit node ID (a knode) corresponding to each given user-defined node. """
-        for node in nodes:
-            yield self.unodes[node]
+        # Lazy like a generator, without a Python frame per node
+        return map(self.unodes.__getitem__, nodes)
 
     def add_node(self, node):
         """ Adds the node and returns the NetworKit ID for the newly added node.
             If the node already existed, returns the existing NetworKit ID. """
-        # If present, return it
-        knode = self.unodes.get(node, None)
-        if knode is None:
-            knode = self.nkG.addNode()
-            self.unodes[node] = knode
-            self.knodes[knode] = node
+        knodes = self.knodes
+        knext = len(knodes)
+        # A single lookup: if absent, the node is mapped to the next knode,
+        # given that NetworKit assigns consecutive IDs
+        knode = self.unodes.setdefault(node, knext)
+        if knode == knext:
+            knew = self.nkG.addNode()
+            assert knew == knode, "knodes out of step with NetworKit node IDs"
+            knodes.append(node) # knodes[knode] = node
         return knode
 
     def add_nodes_from(self, nodes):
         """ Given an iterable of nodes to add, add them and return an iterable of knodes.
-            If a node already exists, its knode is returned in any case. """
+            If a node already exists, its knode is returned in any case.
+            When nodes has a length (e.g. a list, tuple or set), the nodes are added
+            right away, with all new nodes added to NetworKit in a single call.
+            Otherwise, nodes are added one at a time as the returned iterable is consumed,
+            so that a generator of nodes is read only once. """
+        if not hasattr(nodes, '__len__'):
+            return self._add_nodes_iter(nodes)
+        # Dereference
+        knodes = self.knodes
+        setdefault = self.unodes.setdefault
+        append_knodes = knodes.append
+        #
+        # As in add_node, a single lookup per node: new nodes are mapped to the next knode
+        kfirst = knext = len(knodes)
+        result = []
+        append_result = result.append
+        try:
+            for node in nodes:
+                knode = setdefault(node, knext)
+                if knode == knext: # node is new
+                    append_knodes(node) # knodes[knode] = node
+                    knext += 1
+                append_result(knode)
+        except BaseException:
+            # Forget the new nodes, which NetworKit has not been told about
+            unodes = self.unodes
+            for node in knodes[kfirst:]:
+                del unodes[node]
+            del knodes[kfirst:]
+            raise
+        if knext > kfirst:
+            klast = self.nkG.addNodes(knext - kfirst)
+            assert klast == knext - 1, "knodes out of step with NetworKit node IDs"
+        return iter(result)
+
+    def _add_nodes_iter(self, nodes):
+        """ Add nodes one at a time, yielding the knode of each. See add_nodes_from. """
         # Dereference
+        knodes = self.knodes
+        setdefault = self.unodes.setdefault
+        append_knodes = knodes.append
         addNode = self.nkG.addNode
-        get = self.unodes.get
-        setitem_unodes = self.unodes.__setitem__
-        setitem_knodes = self.knodes.__setitem__
         #
+        knext = len(knodes)
         for node in nodes:
-            knode = get(node, None)
-            if knode is None:
-                knode = addNode()
-                setitem_unodes(node, knode) # unodes[node] = knode
-                setitem_knodes(knode, node) # knodes[knode] = node
+            knode = setdefault(node, knext)
+            if knode == knext: # node is new
+                addNode()
+                append_knodes(node) # knodes[knode] = node
+                knext += 1
             yield knode
 
-    def add_edge(self, source, target, weight=1.0):
+    # For internal use: NXGraph and NXDiGraph override add_nodes_from to return nothing
+    _add_nodes_from = add_nodes_from
+
+    def add_edge(self, source, target, weight=1.0, check_duplicates=True):
         """ Adds an edge relating source and target.
             The weight must be a number, or leave it as default (1.0).
             Does not allow duplicated edges (like networkx, and unlike NetworKit).
             If the edge exists, the weight is updated.
-            Does not add two edges like networkx: NetworKit has true undirected edges. """
+            Does not add two edges like networkx: NetworKit has true undirected edges.
+            With check_duplicates=False, the edge is added without checking whether it exists,
+            saving an O(degree) search in NetworKit. Only use it when the edge is known to be new:
+            NetworKit does not handle duplicated edges consistently. """
         # Must check that the weight is a number.
         # Will throw a ValueError if it is not a float.
         weight = float(weight)
         ksource = self.add_node(source)
         ktarget = self.add_node(target)
-        if self.nkG.hasEdge(ksource, ktarget):
-            if self.nkG.isWeighted():
-                self.nkG.setWeight(ksource, ktarget, weight)
-        else:
+        if not check_duplicates:
             self.nkG.addEdge(ksource, ktarget, weight)
+        # With checkMultiEdge, NetworKit adds the edge only if absent, in a single call
+        elif not self.nkG.addEdge(ksource, ktarget, weight, False, True) and self._weighted:
+            self.nkG.setWeight(ksource, ktarget, weight)
 
-    def add_edges_from(self, edges):
+    def add_edges_from(self, edges, check_duplicates=True):
         """ Differs from networkx's add_edges_from in that the tuple
             describing each edge, if it has 3 entries, the 3rd entry
             is the weight, not a dictionary.
-            See also: add_edges_from_pairs when individual weights are not needed. """
+            When the first edge is a pair, all edges must be pairs, and have a weight of 1.0.
+            Otherwise, pairs among the edges get a weight of 1.0.
+            With check_duplicates=False, edges are not checked for existing in the graph
+            nor for being repeated: see add_edge.
+            See also: add_edges_from_pairs when individual weights are not needed,
+            and add_edges_bulk for edges already split into sources, targets and weights. """
         edges = iter(edges) # ensure iterator
         # Discover if edges is an iterable of pairs
-        edge = next(edges)
+        edge = next(edges, None)
+        if edge is None:
+            return # no edges
+        # Put the first edge back in front of the rest
+        edges = chain((edge,), edges)
         if 2 == len(edge):
             # Choose higher-performance function
-            self.add_edge(edge[0], edge[1])
-            self.add_edges_from_pairs(edges)
+            self.add_edges_from_pairs(edges, check_duplicates=check_duplicates)
         else:
-            self.add_edge(edge[0], edge[1], float(edge[2]))
-            is_weighted = self.nkG.isWeighted()
-            # Dereference: performance gain
-            hasEdge = self.nkG.hasEdge
-            addEdge = self.nkG.addEdge
-            setWeight = self.nkG.setWeight
-            #
-            weights = deque() # will only ever have one single value
-            def storeWeight(edge):
-                weights.append(edge[2])
-                return edge[0:2]
-            #
-            knodes = self.add_nodes_from(chain.from_iterable(map(storeWeight, edges))) # here, map is faster than list comprehension
-            for ksource in knodes:
-                ktarget = next(knodes)
-                w = weights.popleft()
-                if hasEdge(ksource, ktarget):
-                    if is_weighted:
-                        setWeight(ksource, ktarget, float(w))
-                else:
-                    addEdge(ksource, ktarget, float(w))
-
-        """ # simple but inneficient: far too many unnecessary function calls
-        for edge in edges:
-            self.add_edge(edge[0], edge[1],
-                          weight=float(edge[2]) if len(edge) > 2 else 1.0)
-        """
-
-    def add_edges_from_pairs(self, edges, weight=1.0):
+            # Walk the edges once, splitting them into lists of sources, targets and weights
+            sources = []
+            targets = []
+            weights = []
+            append_sources = sources.append
+            append_targets = targets.append
+            append_weights = weights.append
+            for edge in edges:
+                append_sources(edge[0])
+                append_targets(edge[1])
+                # Raises ValueError before any edge is added, the first one included
+                append_weights(float(edge[2]) if len(edge) > 2 else 1.0)
+            self.add_edges_bulk(sources, targets, weights, check_duplicates=check_duplicates)
+
+    def add_edges_bulk(self, sources, targets, weights=None, check_duplicates=True, sort=False):
+        """ Add edges given as separate sequences of source nodes, target nodes and,
+            optionally, weights, like the columns of a table or numpy arrays.
+            Without weights, all edges have weight 1.0.
+            All new nodes are added to NetworKit with a single call, and so are all new edges.
+            With sort=True, new edges are first sorted by source, so that NetworKit fills
+            one adjacency list after another; the sort usually costs more than it saves.
+            With check_duplicates=False, edges are not checked for existing in the graph
+            nor for being repeated: see add_edge. """
+        if len(sources) != len(targets) or (weights is not None and len(weights) != len(sources)):
+            raise ValueError("sources, targets and weights must have the same length")
+        # Convert all weights at once: raises ValueError before any edge is added
+        weights = 1.0 if weights is None else np.asarray(weights, dtype=np.float64)
+        # Only edges between nodes that existed before can be present already
+        kbound = len(self.knodes)
+        if isinstance(sources, np.ndarray) and isinstance(targets, np.ndarray) \
+          and sources.dtype.kind == targets.dtype.kind and sources.dtype.kind in 'iuUS':
+            self._add_kedges(self._map_node_arrays(sources, targets), kbound, weights, check_duplicates, sort)
+            return
+        # Use python objects as nodes rather than numpy scalars
+        if isinstance(sources, np.ndarray):
+            sources = sources.tolist()
+        if isinstance(targets, np.ndarray):
+            targets = targets.tolist()
+        # Interleaved, so that nodes are added in the order in which they appear in the edges.
+        # Given a list, all new nodes are added to NetworKit at once.
+        knodes = list(self._add_nodes_from(list(chain.from_iterable(zip(sources, targets)))))
+        self._add_kedges(iter(knodes), kbound, weights, check_duplicates, sort)
+
+    def _map_node_arrays(self, sources, targets):
+        """ Given numpy arrays of source and target nodes, of integers or strings,
+            return a numpy array of their alternating knodes, adding new nodes.
+            Each distinct node is looked up only once: the array of edges is then
+            mapped to knodes in numpy, without a dictionary lookup per edge. """
+        # Interleaved, so that nodes are added in the order in which they appear in the edges
+        nodes = np.stack((sources, targets), axis=1).ravel()
+        unique, first, inverse = np.unique(nodes, return_index=True, return_inverse=True)
+        # Rank of each distinct node by first appearance
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        # Use python objects as nodes rather than numpy scalars
+        kunique = np.array(list(self._add_nodes_from(unique[order].tolist())), dtype=np.uint64)
+        return np.take(kunique, np.take(rank, inverse.ravel()))
+
+    def add_edges_from_pairs(self, edges, weight=1.0, check_duplicates=True):
         """ Add edges from an iterable of pairs of nodes.
-            All edges with default weight of 1.0. """
+            All edges with default weight of 1.0.
+            New edges are inserted into NetworKit with a single batch call.
+            With check_duplicates=False, edges are not checked for existing in the graph
+            nor for being repeated: see add_edge. """
         weight = float(weight) # ensure number
-        is_weighted = self.nkG.isWeighted()
-        # Dereference: performance gain
-        hasEdge = self.nkG.hasEdge
+        # Only edges between nodes that existed before this call can be present already
+        kbound = len(self.knodes)
+        knodes = self._add_nodes_from(chain.from_iterable(edges)) # a generator
+        self._add_kedges(knodes, kbound, weight, check_duplicates)
+
+    def add_edges_from_indices(self, nodes, edges, weight=1.0, check_duplicates=True):
+        """ Add edges given as pairs of indices into the sequence of nodes,
+            such as when reading a file that lists the nodes first and then the edges
+            between node numbers. The edges can be any array-like of shape (n, 2),
+            like a numpy array of integers.
+            Each node is looked up only once, rather than once per edge it is part of,
+            and the translation of indices to knodes is done by numpy in a single step.
+            Indices must be integers from 0 to len(nodes) - 1: numpy would otherwise
+            wrap negative ones and truncate floats. They are checked before anything is added.
+            See add_edges_from_pairs for the weight and check_duplicates. """
+        weight = float(weight) # ensure number
+        if not hasattr(nodes, '__len__'):
+            nodes = list(nodes) # read once, and know how many
+        indices = np.asarray(edges)
+        if indices.size > 0:
+            if indices.dtype.kind not in 'iu':
+                raise TypeError("Edge indices must be integers, not %s" % indices.dtype)
+            if indices.min() < 0 or indices.max() >= len(nodes):
+                raise IndexError("Edge indices must be in the range [0, %i)" % len(nodes))
+        indices = indices.astype(np.intp).reshape(-1, 2)
+        # Only edges between nodes that existed before this call can be present already
+        kbound = len(self.knodes)
+        # The knode of each node, by index
+        knodes = np.array(list(self._add_nodes_from(nodes)), dtype=np.uint64)
+        kedges = knodes[indices]
+        if check_duplicates:
+            self._add_kedges(kedges.ravel(), kbound, weight, True)
+        else:
+            self._add_knode_pairs(np.ascontiguousarray(kedges[:, 0]),
+                                  np.ascontiguousarray(kedges[:, 1]),
+                                  weight)
+
+    def _add_kedges(self, knodes, kbound, weights, check_duplicates, sort=False):
+        """ Add edges from an iterator, or a numpy array, of alternating source and target knodes.
+            The weights are either one float for all edges or a float64 array with one weight per edge.
+            Only knodes below kbound can have edges already: the others are new.
+            Existing edges have their weight updated, and edges new to the graph
+            are inserted with a single NetworKit batch call.
+            Repeated edges are found with numpy over packed edge keys rather than
+            edge by edge, and NetworKit is only asked about edges between old knodes.
+            Batches of fewer than BATCH_THRESHOLD edges are added one edge at a time instead,
+            which avoids the fixed cost of the numpy and batch calls. """
+        if not isinstance(knodes, np.ndarray):
+            # Read up to the threshold first: small batches never become arrays
+            head = list(islice(knodes, 2 * BATCH_THRESHOLD))
+            if len(head) < 2 * BATCH_THRESHOLD:
+                self._add_kedges_one_by_one(head, weights, check_duplicates)
+                return
+            knodes = np.fromiter(chain(head, knodes), dtype=np.uint64)
+        elif len(knodes) < 2 * BATCH_THRESHOLD:
+            self._add_kedges_one_by_one(knodes.tolist(), weights, check_duplicates)
+            return
+        if not check_duplicates:
+            # Sources and targets alternate; NetworKit requires contiguous arrays
+            self._add_knode_pairs(np.ascontiguousarray(knodes[0::2]),
+                                  np.ascontiguousarray(knodes[1::2]),
+                                  weights,
+                                  sort)
+            return
+        #
+        ksources = knodes[0::2]
+        ktargets = knodes[1::2]
+        if isinstance(weights, float):
+            kweights = np.full(len(ksources), weights)
+        else:
+            kweights = np.asarray(weights, dtype=np.float64)
+        #
+        # Pack each edge into a single int, with undirected edges as (min, max)
+        if self._directed:
+            keys = (ksources << np.uint64(32)) | ktargets
+        else:
+            keys = (np.minimum(ksources, ktargets) << np.uint64(32)) | np.maximum(ksources, ktargets)
+        # Keep the last occurrence of each repeated edge, so that the last weight wins
+        _, rfirst = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - rfirst)
+        ksources = ksources[keep]
+        ktargets = ktargets[keep]
+        kweights = kweights[keep]
+        #
+        # Only edges between two knodes below kbound can exist already
+        old = np.flatnonzero((ksources < kbound) & (ktargets < kbound))
+        if len(old) > 0:
+            exists = np.fromiter(map(self.nkG.hasEdge, ksources[old].tolist(), ktargets[old].tolist()),
+                                 dtype=bool, count=len(old))
+            old = old[exists]
+            if self._weighted:
+                # Dereference
+                setWeight = self.nkG.setWeight
+                for ksource, ktarget, w in zip(ksources[old].tolist(),
+                                               ktargets[old].tolist(),
+                                               kweights[old].tolist()):
+                    setWeight(ksource, ktarget, w)
+            if len(old) > 0:
+                new = np.ones(len(ksources), dtype=bool)
+                new[old] = False
+                ksources = ksources[new]
+                ktargets = ktargets[new]
+                kweights = kweights[new]
+        #
+        self._add_knode_pairs(np.ascontiguousarray(ksources),
+                              np.ascontiguousarray(ktargets),
+                              kweights,
+                              sort)
+
+    def _add_kedges_one_by_one(self, knodes, weights, check_duplicates):
+        """ Add edges from a list of alternating source and target knodes, like add_edge does.
+            See _add_kedges for the weights. """
+        # Dereference
         addEdge = self.nkG.addEdge
         setWeight = self.nkG.setWeight
+        is_weighted = self._weighted
         #
-        knodes = self.add_nodes_from(chain.from_iterable(edges)) # a generator
-        # Consumes two knodes at a time: notice the call to next(knodes)
-        for ksource in knodes:
-            ktarget = next(knodes)
-            if hasEdge(ksource, ktarget):
-                if is_weighted:
-                    setWeight(ksource, ktarget, weight)
-            else:
+        if isinstance(weights, float):
+            weights = repeat(weights)
+        elif isinstance(weights, np.ndarray):
+            weights = weights.tolist()
+        for ksource, ktarget, weight in zip(knodes[0::2], knodes[1::2], weights):
+            if not check_duplicates:
                 addEdge(ksource, ktarget, weight)
+            # With checkMultiEdge, NetworKit adds the edge only if absent, in a single call
+            elif not addEdge(ksource, ktarget, weight, False, True) and is_weighted:
+                setWeight(ksource, ktarget, weight)
+
+    def _add_knode_pairs(self, ksources, ktargets, weights, sort=False):
+        """ Add edges between the knodes in the given uint64 arrays with one NetworKit call,
+            without checking for duplicates.
+            The weights are either one float for all edges or a sequence with one weight per edge.
+            With sort, the edges are first sorted by source knode, so that NetworKit
+            appends to one adjacency list after another rather than jumping between them. """
+        if sort and len(ksources) > 1:
+            order = np.argsort(ksources, kind='stable')
+            ksources = ksources[order]
+            ktargets = ktargets[order]
+            if self._weighted and not isinstance(weights, float):
+                weights = np.asarray(weights, dtype=np.float64)[order]
+        if self._weighted:
+            if isinstance(weights, float):
+                weights = np.full(len(ksources), weights)
+            else:
+                weights = np.ascontiguousarray(weights, dtype=np.float64)
+            self.nkG.addEdges((weights, (ksources, ktargets)))
+        else:
+            self.nkG.addEdges((ksources, ktargets))
 
     def add_path(self, nodes, weight=1.0, cycle=False):
         """ Add edges in a path.
             If an edge exists, will update the weight. """
         weight = float(weight)
-        is_weighted = self.nkG.isWeighted()
+        is_weighted = self._weighted
         # Dereference
-        hasEdge = self.nkG.hasEdge
         addEdge = self.nkG.addEdge
         setWeight = self.nkG.setWeight
         #
-        knodes = self.add_nodes_from(nodes)
-        ksource = next(knodes)
-        if cycle:
-            knodes = chain(knodes, (ksource,))
-        for ktarget in knodes:
-            if hasEdge(ksource, ktarget):
-                if is_weighted:
-                    setWeight(ksource, ktarget, weight)
-            else:
-                addEdge(ksource, ktarget, weight)# faster function call with weight as 3rd arg than as keyword arg with w=weight
-            ksource = ktarget
+        knodes = list(self._add_nodes_from(nodes))
+        if cycle and knodes:
+            knodes.append(knodes[0])
+        for ksource, ktarget in pairwise(knodes): # pairs made in C
+            # Add the edge unless it exists (checkMultiEdge=True), in a single call.
+            # Faster function call with positional arguments than with keyword arguments.
+            if not addEdge(ksource, ktarget, weight, False, True) and is_weighted:
+                setWeight(ksource, ktarget, weight)
 
     def add_cycle(self, nodes, weight=1.0):
         """ Add edges into a closed path.
@@ -173,60 +412,98 @@ class Graph:
         """ First node makes an edge to every other node.
             If an edge exists, will update the weight. """
         weight = float(weight)
-        is_weighted = self.nkG.isWeighted()
+        is_weighted = self._weighted
         # Dereference
-        hasEdge = self.nkG.hasEdge
         addEdge = self.nkG.addEdge
         setWeight = self.nkG.setWeight
         #
-        knodes = self.add_nodes_from(nodes)
+        knodes = self._add_nodes_from(nodes)
         ksource = next(knodes)
         for ktarget in knodes:
-            if hasEdge(ksource, ktarget):
-                if is_weighted:
-                    setWeight(ksource, ktarget, weight)
-            else:
-                addEdge(ksource, ktarget, weight)
+            # Add the edge unless it exists (checkMultiEdge=True), in a single call
+            if not addEdge(ksource, ktarget, weight, False, True) and is_weighted:
+                setWeight(ksource, ktarget, weight)
 
     def remove_node(self, node):
-        knode = self.unodes.get(node, None)
-        if knode:
+        knode = self.unodes.pop(node, None)
+        if knode is not None:
+            self._pending_removals += self._incident_degree(knode)
             self.nkG.removeNode(knode)
-            del self.unodes[node]
-            del self.knodes[knode]
+            # Keep the slot: NetworKit does not reuse the IDs of removed nodes
+            self.knodes[knode] = None
 
     def remove_nodes_from(self, nodes):
-        for node in node:
-            self.remove_node(node)
+        """ Remove the given nodes and their edges. Nodes not in the graph are ignored.
+            As in remove_edges_from, the removed edges are left for a later compaction. """
+        # Dereference
+        knodes = self.knodes
+        removeNode = self.nkG.removeNode
+        incident_degree = self._incident_degree
+        #
+        # Forget all nodes first: nodes not in the graph pop as None
+        removed = [knode for knode in map(self.unodes.pop, nodes, repeat(None)) if knode is not None]
+        for knode in removed:
+            # Edges between two removed nodes are counted twice: an upper bound suffices
+            self._pending_removals += incident_degree(knode)
+            removeNode(knode)
+            knodes[knode] = None
+        if self._pending_removals > COMPACT_FRACTION * max(1, self.nkG.numberOfEdges()):
+            self.compact()
+
+    def _incident_degree(self, knode):
+        """ Return the number of edges incident to knode, which its removal removes too. """
+        if self._directed:
+            return self.nkG.degree(knode) + self.nkG.degreeIn(knode)
+        return self.nkG.degree(knode)
 
     def remove_edge(self, source, target):
         ksource = self.unodes.get(source, None)
         ktarget = self.unodes.get(target, None)
         if ksource is not None and ktarget is not None:
             self.nkG.removeEdge(ksource, ktarget)
+            self._pending_removals += 1
 
     def remove_edges_from(self, edges):
+        """ Remove the edges given as pairs of nodes. Like in networkx, edges not in the graph are ignored.
+            NetworKit's edge storage is compacted, in O(N + E), only once
+            the removals pending since the last compaction exceed a fraction (COMPACT_FRACTION)
+            of all edges: see compact. """
+        # Dereference
+        get = self.unodes.get
+        removeEdge = self.nkG.removeEdge
+        #
         for edge in edges:
-            self.remove_edge(edge[0], edge[1])
+            ksource = get(edge[0], None)
+            ktarget = get(edge[1], None)
+            if ksource is not None and ktarget is not None:
+                try:
+                    removeEdge(ksource, ktarget)
+                    self._pending_removals += 1
+                except RuntimeError:
+                    pass # NetworKit raises when the edge does not exist
+        if self._pending_removals > COMPACT_FRACTION * max(1, self.nkG.numberOfEdges()):
+            self.compact()
+
+    def compact(self):
+        """ Compact NetworKit's edge storage, reclaiming the slots of removed edges.
+            Edge removals defer this O(N + E) step until enough of them are pending. """
         self.nkG.compactEdges()
+        self._pending_removals = 0
 
     def has_successor(self, node):
         knode = self.unodes.get(node, None)
         if knode is None:
             return False
-        return len(self.nkG.neighbors(knode)) > 0
+        return self.nkG.degree(knode) > 0
 
     def has_predecessor(self, node):
         knode = self.unodes.get(node, None)
         if knode is None:
             return False
-        if self.nkG.isDirected():
-            # Find at least one predecessor: a source that has node as target
-            for ksource, ktarget in self.nkG.edges():
-                if ktarget == knode:
-                    return True
+        if self._directed:
+            return self.nkG.degreeIn(knode) > 0
         else:
-            return len(self.nkG.neighbors(knode)) > 0
+            return self.nkG.degree(knode) > 0
 
     def number_of_nodes(self):
         return self.nkG.numberOfNodes()
@@ -252,30 +529,54 @@ class Graph:
         return self.nkG.numberOfSelfLoops()
 
     def selfloop_edges(self):
-        for ksource, ktarget in self.nkG.edges():
-            if ksource == ktarget:
-                node = self.knodes[ksource]
-                yield (node, node)
+        for node in self.nodes_with_selfloops():
+            yield (node, node)
 
     def nodes_with_selfloops(self):
-        for node, _ in self.selfloop_edges():
-            yield node
-
-    def subgraph(self, nodes):
+        """ NetworKit counts self-loops as edges are added and removed: without any, return at once.
+            Otherwise check each node for an edge to itself, stopping when all self-loops
+            have been found. Each check scans the node's adjacency list, so the worst case
+            is O(N + E), like iterating all edges, but spent in C++ rather than in python. """
+        remaining = self.nkG.numberOfSelfLoops()
+        if 0 == remaining:
+            return
         # Dereference
-        uget = self.unodes.get
+        hasEdge = self.nkG.hasEdge
+        knodes = self.knodes
         #
-        unodes = {}
-        knodes = {}
-        for node in nodes:
-            knode = uget(node, None)
-            if knode is None:
-                continue
-            unodes[node] = knode
-            knodes[knode] = node
-        sub = self.__class__(nkG=self.nkG.subgraphFromNodes(knodes.keys()))
-        sub.unodes = unodes
-        sub.knodes = knodes
+        for knode in self.nkG.iterNodes():
+            if hasEdge(knode, knode):
+                yield knodes[knode]
+                remaining -= 1
+                if 0 == remaining:
+                    return
+
+    def subgraph(self, nodes, compact=False):
+        """ Return a new graph with the given nodes and the edges among them.
+            Nodes not in this graph are ignored.
+            The subgraph keeps the knodes of this graph, so that its list of knodes
+            is as long as this graph's. With compact=True, the subgraph's knodes are
+            renumbered from zero instead, in the same ascending order. """
+        # Dereference
+        knodes = self.knodes
+        #
+        # A flat list of knodes, skipping nodes not in this graph
+        ksel = [knode for knode in map(self.unodes.get, nodes) if knode is not None]
+        if compact:
+            # NetworKit numbers the nodes in the order of the list, which must not repeat them
+            ksel = sorted(set(ksel))
+            sub = self.__class__(nkG=graphtools.subgraphFromNodes(self.nkG, ksel, compact=True))
+            sub.knodes = [knodes[knode] for knode in ksel]
+            sub.unodes = {node: knode for knode, node in enumerate(sub.knodes)}
+            return sub
+        # NetworKit counts a repeated node once per repeat
+        ksel = list(dict.fromkeys(ksel))
+        sub = self.__class__(nkG=graphtools.subgraphFromNodes(self.nkG, ksel))
+        # The subgraph keeps the NetworKit node IDs of this graph
+        sub.knodes = [None] * len(knodes)
+        for knode in ksel:
+            sub.knodes[knode] = knodes[knode]
+        sub.unodes = {knodes[knode]: knode for knode in ksel}
         return sub
 
     def edges(self, weight=False):
@@ -283,66 +584,94 @@ class Graph:
         kget = self.knodes.__getitem__
         #
         if weight:
-            # Dereference
-            weightFn = self.nkG.weight
-            #
-            for ksource, ktarget in self.nkG.edges():
+            # Each edge comes with its weight: no lookup of the weight per edge
+            for ksource, ktarget, w in self.nkG.iterEdgesWeights():
                 yield (kget(ksource), # self.knodes[ksource]
                        kget(ktarget), # self.knodes[ktarget]
-                       weightFn(ksource, ktarget)) # self.nkG.weight(ksource, ktarget)
+                       w)
         else:
-            for ksource, ktarget in self.nkG.edges():
+            for ksource, ktarget in self.nkG.iterEdges(): # lazy: does not build a list of all edges
                 yield (kget(ksource), # self.knodes[ksource]
                        kget(ktarget)) # self.knodes[ktarget]
 
     def nodes(self):
         # Correct, but wrong order. Wouldn't match with order in e.g. adjacency_matrix()
         # return self.unodes.keys()
-        return self.to_user_nodes(self.nkG.nodes())
+        return self.to_user_nodes(self.nkG.iterNodes())
 
     def is_multigraph(self):
         return False
 
     def is_directed(self):
-        return self.nkG.isDirected()
+        return self._directed
 
     def to_directed(self):
         """ Return a directed copy of the graph: two directed edges for every undirected edge. """
-        if self.is_directed():
+        if self._directed:
             return self.copy(directed=True)
         #
-        d = DiGraph(weighted=self.nkG.isWeighted())
-        def reciprocal_edges():
-            for source, target, weight in self.edges(weight=True):
-                yield source, target, weight
-                yield target, source, weight
-        d.add_edges_from(reciprocal_edges())
+        d = self._copy_nodes(DiGraph(weighted=self._weighted))
+        ksources, ktargets, weights = self._kedge_arrays()
+        # Reciprocal edges, except for self-loops, which need only one
+        loose = ksources != ktargets
+        d._add_knode_pairs(np.concatenate((ksources, ktargets[loose])),
+                           np.concatenate((ktargets, ksources[loose])),
+                           np.concatenate((weights, weights[loose])))
         return d
 
     def copy(self, directed=False):
         """ Safely deep-copy this graph. """
-        # While it could be made faster, there is no guarantee as to what IDs
-        # the NetworKit Graph.addNode function will return.
-        copy = self.__class__(weighted=self.nkG.isWeighted(), directed=directed)
-        for ksource, ktarget in self.nkG.edges():
-            copy.add_edge(self.knodes[ksource],
-                          self.knodes[ktarget],
-                          self.nkG.weight(ksource, ktarget))
+        if directed == self._directed:
+            # NetworKit's copy constructor duplicates nodes and edges in C++,
+            # keeping the knodes, so that the node maps can be copied as they are.
+            copy = self.__class__(nkG=graph.Graph(self.nkG, self._weighted, directed))
+            copy.unodes = dict(self.unodes)
+            copy.knodes = list(self.knodes)
+            return copy
+        # Converting between directed and undirected: NetworKit's copy constructor
+        # would sum the weights of reciprocal edges. Instead, add all edges in one batch
+        # that skips repeated edges, keeping the last weight, like add_edge would.
+        copy = self._copy_nodes(self.__class__(weighted=self._weighted, directed=directed))
+        ksources, ktargets, weights = self._kedge_arrays()
+        kpairs = np.stack((ksources, ktargets), axis=1).ravel() # alternating
+        # No edges exist yet in the copy: all its knodes are new
+        copy._add_kedges(kpairs, 0, weights, True)
+        return copy
+
+    def _copy_nodes(self, copy):
+        """ Add to copy, an empty graph, the nodes of this graph with the same knodes, and return it. """
+        if self.knodes:
+            copy.nkG.addNodes(len(self.knodes))
+            removeNode = copy.nkG.removeNode
+            for knode, node in enumerate(self.knodes):
+                if node is None:
+                    removeNode(knode) # keep the knodes of removed nodes unused
+        copy.unodes = dict(self.unodes)
+        copy.knodes = list(self.knodes)
         return copy
 
+    def _kedge_arrays(self):
+        """ Return all edges as numpy arrays of source knodes, target knodes and weights. """
+        kedges = np.array(list(self.nkG.iterEdgesWeights()), dtype=np.float64).reshape(-1, 3)
+        return (kedges[:, 0].astype(np.uint64),
+                kedges[:, 1].astype(np.uint64),
+                np.ascontiguousarray(kedges[:, 2]))
+
     def to_undirected(self):
         return self.copy(directed=False)
 
     def clear(self):
-        self.nkG = graph.Graph(weighted=self.nkG.isWeighted(), directed=self.nkG.isDirected())
+        self.nkG = graph.Graph(weighted=self._weighted, directed=self._directed)
         self.unodes.clear()
         self.knodes.clear()
+        self._pending_removals = 0
 
     def __iter__(self):
         """ Return an iterator over all nodes of the graph. """
-        return self.nodes()
+        # Not self.nodes(), which returns a list in NXGraph and NXDiGraph
+        return self.to_user_nodes(self.nkG.iterNodes())
         # Correct, but wrong order
-        # return self.unodes.keys()
+        # return iter(self.unodes)
 
     def __contains__(self, node):
         """ Return true if node exists in the graph. """
@@ -353,13 +682,18 @@ class Graph:
         """ Return the number of nodes. """
         return self.number_of_nodes()
 
-    def ___getitem__(self, node):
+    def __getitem__(self, node):
         """ Return a dictionary of nodes connected to node as keys, and edge weight as values. """
         knode = self.unodes.get(node, None)
-        if knode:
-            return {kn: self.nkG.weight(kn) for kn in self.nkG.neighbors(knode)}
-        else:
+        if knode is None:
             return {}
+        knodes = self.knodes
+        if self._weighted:
+            # Neighbors and weights in a single pass over the adjacency list
+            return {knodes[kn]: w for kn, w in self.nkG.iterNeighborsWeights(knode)}
+        else:
+            # Built in C, without a Python-level loop
+            return dict.fromkeys(map(knodes.__getitem__, self.nkG.iterNeighbors(knode)), 1.0)
 
     def has_node(self, node):
         """ Return true if node exists in the graph. """
@@ -388,9 +722,9 @@ class Graph:
         if ksource is not None:
             # nbunch is a single node
             if weight:
-                return sum(self.nkG.weight(ksource, ktarget) for ktarget in self.nkG.neighbors(ksource))
+                return self.nkG.weightedDegree(ksource)
             else:
-                return len(self.nkG.neighbors(ksource))
+                return self.nkG.degree(ksource)
 
     def degrees(self, nbunch=None, weight=False):
         """ Return a generator of (node, degree) tuples.
@@ -399,54 +733,44 @@ class Graph:
             otherwise the degree is the sum of a node edges' weights.
             When an iterable of nodes is provided with nbunch, will silently ignore
             nodes not in this graph. """
-        # Dereference
-        weightFn = self.nkG.weight
-        neighbors = self.nkG.neighbors
+        # NetworKit computes either degree in C++, without visiting each neighbor from python
+        degreeFn = self.nkG.weightedDegree if weight else self.nkG.degree
         #
         if nbunch is None:
-            # Surely there is way using partial and starmap to avoid these repetitions
-            if weight:
-                for node, ksource in self.unodes.items():
-                    yield node, sum(weightFn(ksource, ktarget) for ktarget in neighbors(ksource))
-            else:
-                for node, ksource in self.unodes.items():
-                    yield node, len(neighbors(ksource))
+            knodes = list(self.nkG.iterNodes())
+            yield from zip(self.to_user_nodes(knodes), map(degreeFn, knodes))
         else:
             # User-provided list may contain nodes not in this graph
             uget = self.unodes.get
-            if weight:
-                for node in nbunch:
-                    ksource = uget(node, None)
-                    if ksource is not None:
-                        yield node, sum(weightFn(ksource, ktarget) for ktarget in neighbors(ksource))
-            else:
-                for node in nbunch:
-                    ksource = uget(node, None)
-                    if ksource is not None:
-                        yield node, len(neighbors(ksource))
+            for node in nbunch:
+                ksource = uget(node, None)
+                if ksource is not None:
+                    yield node, degreeFn(ksource)
 
     def adjacency(self):
         """ Like networkx.graph.adjacency_iter.
             The order of the nodes is that of self.nodes(). """
         # Dereference
-        neighbors = self.nkG.neighbors
-        kget = self.knodes.get
+        iterNeighbors = self.nkG.iterNeighbors
+        kget = self.knodes.__getitem__
         #
-        for knode in self.nkG.nodes():
-            yield list(map(kget, neighbors(knode)))
+        # Indexing the list of knodes from map is a C-level gather:
+        # numpy.take over an object array measured slower, counting the array conversions.
+        for knode in self.nkG.iterNodes():
+            yield list(map(kget, iterNeighbors(knode)))
 
     def adjacency_matrix(self, sparse=True):
         """ If sparse=True (default) returns a scipy.sparse.crs.crs_matrix,
             otherwise a numpy.ndarray with the dense matrix.
             The edge weights are the values in the matrix.
             To identify which matrix row and column index corresponds to which graph node,
-            get the node list from self.nkG.nodes(). """
+            get the node list from self.nkG.iterNodes(). """
         t = 'sparse' if sparse else 'dense'
         return algebraic.adjacencyMatrix(self.nkG, matrixType=t)
 
     def nx_adapter(self):
         """ Return a wrapper over this nxnk graph (not a copy) with methods compatible with networkx. """
-        nxg = NXGraph(weighted=self.nkG.isWeighted(), nkG=self.nkG)
+        nxg = NXGraph(weighted=self._weighted, nkG=self.nkG)
         nxg.unodes = self.unodes
         nxg.knodes = self.knodes
         return nxg
@@ -500,11 +824,20 @@ class DiGraph(Graph):
     def copy(self, directed=True):
         return super(DiGraph, self).copy(directed=directed)
 
+    def successors(self, node):
+        """ Return an iterator over the nodes that node has an edge to. """
+        return self.to_user_nodes(self.nkG.iterNeighbors(self.unodes[node]))
+
+    def predecessors(self, node):
+        """ Return an iterator over the nodes that have an edge to node,
+            read from NetworKit's in-edges rather than by searching all edges. """
+        return self.to_user_nodes(self.nkG.iterInNeighbors(self.unodes[node]))
+
     def reverse(self):
         """ Return a new DiGraph with all edges reversed. """
-        d = self.__class__(weighted=self.nkG.isWeighted(), nkG=self.nkG.transpose())
+        d = self.__class__(weighted=self._weighted, nkG=graphtools.transpose(self.nkG))
         d.unodes.update(self.unodes)
-        d.knodes.update(self.knodes)
+        d.knodes.extend(self.knodes)
         return d
 
     def nx_adapter(self):
@@ -516,6 +849,176 @@ class DiGraph(Graph):
 
 
 
+class IdentityGraph(Graph):
+    """
+    A Graph whose nodes are non-negative integers, each used directly as its own
+    NetworKit node ID (knode), such as when loading a graph from an edge list file
+    whose nodes are already numbered from zero.
+    There is no dictionary of user-defined nodes to hash into on every operation.
+    Adding a node also adds all missing nodes with a lower number.
+    """
+
+    def __init__(self, weighted=True, directed=False, nkG=None):
+        # Built once: reads self.knodes, so it follows reassignments of the list
+        self._unodes = _IdentityMap(self)
+        super(IdentityGraph, self).__init__(weighted=weighted, directed=directed, nkG=nkG)
+
+    @property
+    def unodes(self):
+        return self._unodes
+
+    @unodes.setter
+    def unodes(self, unodes):
+        pass # the map is implied by self.knodes
+
+    def _knode(self, node):
+        """ Return the knode of node, which is node itself, or None if not in the graph. """
+        knodes = self.knodes
+        try:
+            if 0 <= node < len(knodes) and knodes[node] is not None:
+                return node
+        except TypeError:
+            pass # not an integer
+        return None
+
+    # Lookups below index self.knodes directly rather than going through self.unodes
+
+    def __contains__(self, node):
+        """ Return true if node exists in the graph. """
+        knodes = self.knodes
+        try:
+            return 0 <= node < len(knodes) and knodes[node] is not None
+        except TypeError:
+            return False # not an integer
+
+    has_node = __contains__
+
+    def has_edge(self, source, target):
+        kbound = len(self.knodes)
+        try:
+            # Reject e.g. floats, which NetworKit would truncate
+            source = index(source)
+            target = index(target)
+        except TypeError:
+            return False # not integers
+        # Removed nodes have no edges: the bounds suffice
+        return 0 <= source < kbound and 0 <= target < kbound and self.nkG.hasEdge(source, target)
+
+    def weight(self, source, target):
+        assert self._knode(source) is not None
+        assert self._knode(target) is not None
+        return self.nkG.weight(source, target)
+
+    def degree(self, nbunch=None, weight=False):
+        """ Return the degree for a single node if the node is in the graph. See Graph.degree. """
+        if self._knode(nbunch) is not None:
+            if weight:
+                return self.nkG.weightedDegree(nbunch)
+            else:
+                return self.nkG.degree(nbunch)
+
+    def __getitem__(self, node):
+        """ Return a dictionary of nodes connected to node as keys, and edge weight as values.
+            The neighbor knodes are the neighbor nodes: no translation needed. """
+        if self._knode(node) is None:
+            return {}
+        if self._weighted:
+            return dict(self.nkG.iterNeighborsWeights(node))
+        else:
+            return dict.fromkeys(self.nkG.iterNeighbors(node), 1.0)
+
+    def add_node(self, node):
+        """ Adds the node, and any missing node below it, and returns the node itself,
+            which is also its knode. """
+        node = index(node) # ensure int
+        knodes = self.knodes
+        if node >= len(knodes):
+            self.nkG.addNodes(node + 1 - len(knodes))
+            knodes.extend(range(len(knodes), node + 1))
+        elif node < 0:
+            raise ValueError("Nodes of an IdentityGraph must not be negative: %s" % node)
+        elif knodes[node] is None:
+            # Removed before: NetworKit can restore it with the same ID
+            self.nkG.restoreNode(node)
+            knodes[node] = node
+        return node
+
+    def add_nodes_from(self, nodes):
+        """ Given an iterable of nodes to add, add them and return an iterable of knodes,
+            which are the nodes themselves. """
+        return map(self.add_node, nodes)
+
+    _add_nodes_from = add_nodes_from
+
+    def subgraph(self, nodes, compact=False):
+        """ Return a new IdentityGraph with the given nodes and the edges among them.
+            Renumbering its nodes would change the nodes themselves: compact is not supported. """
+        if compact:
+            raise ValueError("The nodes of an IdentityGraph cannot be renumbered: compact must be False")
+        return super(IdentityGraph, self).subgraph(nodes)
+
+    def nx_adapter(self):
+        """ Return a wrapper over this graph (not a copy) with methods compatible with networkx,
+            which keeps using each node as its own knode. """
+        nxg = NXIdentityGraph(weighted=self._weighted, directed=self._directed, nkG=self.nkG)
+        nxg.knodes = self.knodes # unodes is implied by knodes
+        return nxg
+
+
+class _IdentityMap:
+    """ Stands in for the dictionary of user-defined nodes to knodes of an IdentityGraph,
+        where each node is its own knode and only the list of knodes is stored. """
+
+    __slots__ = ('graph',)
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def get(self, node, default=None):
+        knode = self.graph._knode(node)
+        return default if knode is None else knode
+
+    def __getitem__(self, node):
+        knode = self.get(node, None)
+        if knode is None:
+            raise KeyError(node)
+        return knode
+
+    def __contains__(self, node):
+        return self.get(node, None) is not None
+
+    def pop(self, node, default=None):
+        knode = self.get(node, None)
+        if knode is None:
+            return default
+        self.graph.knodes[knode] = None
+        return knode
+
+    def __iter__(self):
+        knodes = self.graph.knodes
+        return (knode for knode in range(len(knodes)) if knodes[knode] is not None)
+
+    def __len__(self):
+        knodes = self.graph.knodes
+        return len(knodes) - knodes.count(None)
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return iter(self)
+
+    def items(self):
+        return ((knode, knode) for knode in self)
+
+    def update(self, unodes):
+        pass # the map is implied by self.knodes
+
+    def clear(self):
+        pass # the map is implied by self.knodes
+
+
+
 # It is likely that the code duplication below can be solved with multiple inheritance.
 
 class NXGraph(Graph):
@@ -569,3 +1072,12 @@ class NXDiGraph(DiGraph):
     def nodes_with_selfloops(self):
         return list(super(NXDiGraph, self).nodes_with_selfloops())
 
+
+class NXIdentityGraph(NXGraph, IdentityGraph):
+    """
+    Adapter class for nxnk.IdentityGraph, like NXGraph for nxnk.Graph.
+    The methods of NXGraph come first, and then those of IdentityGraph.
+    """
+
+    def __init__(self, weighted=True, directed=False, nkG=None):
+        super(NXIdentityGraph, self).__init__(weighted=weighted, directed=directed, nkG=nkG)
@@ -1,19 +1,28 @@
+import sys
 import inspect
 import traceback
 import warnings
 import functools
 
 # Taken from: user ADR, https://stackoverflow.com/a/40899499
-def deprecated(message: str = ''):
+def deprecated(message: str = '', verbose: bool = False):
     """
     This is a decorator which can be used to mark functions
     as deprecated. It will result in a warning being emitted
     when the function is used first time and filter is set for show DeprecationWarning.
+    A warning is emitted once per calling code location, identified by its code object
+    and bytecode offset, which is cheap to compute on every call.
+    With verbose=True, the call source is instead the whole formatted stack,
+    so that each distinct path to the call warns, at a much higher cost per call.
     """
     def decorator_wrapper(func):
         @functools.wraps(func)
         def function_wrapper(*args, **kwargs):
-            current_call_source = '|'.join(traceback.format_stack(inspect.currentframe()))
+            if verbose:
+                current_call_source = '|'.join(traceback.format_stack(inspect.currentframe()))
+            else:
+                caller = sys._getframe(1)
+                current_call_source = (caller.f_code, caller.f_lasti)
             if current_call_source not in function_wrapper.last_call_source:
                 warnings.warn("Function {} is deprecated! {}".format(func.__name__, message),
                               category=DeprecationWarning, stacklevel=2)
@@ -25,4 +34,3 @@ def deprecated(message: str = ''):
 
         return function_wrapper
     return decorator_wrapper
-